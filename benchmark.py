@@ -0,0 +1,281 @@
+"""Reproducible performance benchmarks for the integrator and both renderers.
+
+Run `python benchmark.py --output results.json` to record a run and
+`python benchmark.py --baseline results.json` to compare against it; the
+exit code is 1 when any result regresses by more than --tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from models import Particles, Planet, System
+
+G = 6.67430e-11
+SUN_MASS = 1.989e30
+BODY_COUNTS = [1, 9, 50, 200]
+PARTICLE_COUNTS = [100_000, 1_000_000]
+
+
+def make_system(n_bodies: int) -> System:
+    """Deterministic system of n circular orbits spread between Mercury and Pluto distances."""
+    sun = Planet("Sun", SUN_MASS, [0, 0], [0, 0])
+    planets = []
+    for i, r in enumerate(np.geomspace(5.7e10, 4.4e12, n_bodies)):
+        angle = 2 * math.pi * i / n_bodies
+        v = math.sqrt(G * SUN_MASS / r)
+        planets.append(Planet(
+            f"Body{i}", 1e22,
+            [r * math.cos(angle), r * math.sin(angle)],
+            [-v * math.sin(angle), v * math.cos(angle)],
+        ))
+    return System(host=sun, planets=planets)
+
+
+def make_belt(n_particles: int, threads: int = 1) -> System:
+    """Deterministic asteroid belt of massless particles between 2.2 and 3.3 AU."""
+    rng = np.random.default_rng(0)
+    r = rng.uniform(3.3e11, 4.9e11, n_particles)
+    angle = rng.uniform(0, 2 * math.pi, n_particles)
+    v = np.sqrt(G * SUN_MASS / r)
+    offsets = np.column_stack((r * np.cos(angle), r * np.sin(angle)))
+    velocities = np.column_stack((-v * np.sin(angle), v * np.cos(angle)))
+    sun = Planet("Sun", SUN_MASS, [0, 0], [0, 0])
+    return System(host=sun, planets=[], particles=Particles(offsets, velocities), threads=threads)
+
+
+def thread_counts() -> list[int]:
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    if cores > 1:
+        counts.append(cores)
+    return counts
+
+
+def best_of(func, repeats: int) -> float:
+    """Minimum wall time of several runs, which is the least noisy estimate."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_step_forward(results: dict, repeats: int, scale: float):
+    for n in BODY_COUNTS:
+        steps = max(10, int(20000 * scale / n))
+        system = make_system(n)
+
+        def run():
+            for _ in range(steps):
+                system.step_forward(60.0)
+
+        elapsed = best_of(run, repeats)
+        results[f"step_forward/{n}_bodies"] = {
+            "value": steps / elapsed, "unit": "steps/s", "higher_is_better": True,
+        }
+
+
+def bench_particles(results: dict, repeats: int, scale: float):
+    # scaling curve of the chunked particle step from one thread up to every core
+    for n in PARTICLE_COUNTS:
+        n_particles = max(1000, int(n * scale))
+        steps = max(2, int(10 * 100_000 / n))
+        single = None
+        for threads in thread_counts():
+            system = make_belt(n_particles, threads)
+
+            def run():
+                for _ in range(steps):
+                    system.step_forward(60.0)
+
+            rate = steps / best_of(run, repeats)
+            system.close()
+            single = single or rate
+            results[f"particles/{n_particles}_threads_{threads}"] = {
+                "value": rate, "unit": "steps/s", "higher_is_better": True, "speedup": rate / single,
+            }
+
+
+def bench_precompute3d(results: dict, repeats: int, scale: float):
+    # same scenario as the 3D precompute in orbitPlotter.main (block-verlet, adaptive samples), minus the cache
+    from sampling import DEFAULT_TOLERANCE
+    from scenario_cache import Scenario, run_scenario
+
+    days, steps_per_day, sub_steps = max(1, int(250 * scale)), 96, 10
+    scenario = Scenario.from_system(
+        make_system(9), 86400 / steps_per_day, sub_steps, days * steps_per_day,
+        tolerance=DEFAULT_TOLERANCE, integrator="block-verlet",
+    )
+
+    elapsed = best_of(lambda: run_scenario(scenario), repeats)
+    # renamed with the workload change so old baselines are not compared against it
+    results["precompute3d/9_bodies_block"] = {
+        "value": elapsed, "unit": "s", "higher_is_better": False, "days": days,
+    }
+
+
+def bench_second_law(results: dict, repeats: int, scale: float):
+    # mirrors second_law_verification.py: one e=0.7 comet at 1 hour steps
+    ecc, r_peri, dt = 0.7, 1.471e11, 3600
+    n_steps = int(3.154e7 * 3 * scale / dt)
+
+    def run():
+        sun = Planet("Sun", SUN_MASS, [0, 0], [0, 0])
+        comet = Planet("Comet", 1e22, [r_peri, 0], [0, math.sqrt(G * SUN_MASS * (1 + ecc) / r_peri)])
+        system = System(host=sun, planets=[comet])
+        positions = [np.array(comet.position)]
+        for _ in range(n_steps):
+            system.step_forward(dt)
+            positions.append(np.array(comet.position))
+
+    elapsed = best_of(run, repeats)
+    results["second_law/3_years"] = {
+        "value": elapsed, "unit": "s", "higher_is_better": False, "steps": n_steps,
+    }
+
+
+def bench_update2d(results: dict, repeats: int, scale: float):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    try:
+        from orbitPlotter import simulate_orbits
+    except ImportError as exc:
+        results["update2d/trails_off"] = results["update2d/trails_on"] = {"skipped": str(exc)}
+        return
+
+    frames = max(5, int(50 * scale))
+    for show_trails in (False, True):
+        system = make_system(9)
+        fig, anim = simulate_orbits(system, show_trails=show_trails, days=10, sub_steps=20)
+        update = anim._func
+
+        def run():
+            for frame in range(frames):
+                update(frame)
+                fig.canvas.draw()
+
+        elapsed = best_of(run, repeats)
+        anim.event_source.stop()
+        plt.close(fig)
+        results[f"update2d/trails_{'on' if show_trails else 'off'}"] = {
+            "value": elapsed / frames * 1000, "unit": "ms/frame", "higher_is_better": False,
+        }
+
+
+def bench_animate3d(results: dict, repeats: int, scale: float):
+    try:
+        import pyvista as pv
+    except ImportError:
+        results["animate3d/9_bodies"] = {"skipped": "pyvista not installed"}
+        return
+    pv.OFF_SCREEN = True
+    from plotter3d import Planet3d, System3d
+
+    samples = max(20, int(200 * scale))
+    template = make_system(9)
+    rng = np.linspace(0, 2 * math.pi, samples)
+
+    def run():
+        planets = []
+        for p in template.planets:
+            r = math.hypot(*p.position)
+            planets.append(Planet3d(p.name, list(r * np.cos(rng)), list(r * np.sin(rng)), [0] * samples))
+        system3d = System3d(planets=planets, show_orbit_paths=False)
+        renders = 0
+        render = system3d.plotter.render
+
+        def counted_render():
+            nonlocal renders
+            renders += 1
+            render()
+
+        system3d.plotter.render = counted_render
+        start = time.perf_counter()
+        # a huge speed factor makes the per-frame sleep negligible
+        system3d.animateSimulation(speed_factor=1e6, key_frames=samples)
+        return (time.perf_counter() - start) / max(1, renders)
+
+    per_frame = min(run() for _ in range(repeats))
+    results["animate3d/9_bodies"] = {
+        "value": per_frame * 1000, "unit": "ms/frame", "higher_is_better": False,
+    }
+
+
+BENCHMARKS = {
+    "step_forward": bench_step_forward,
+    "particles": bench_particles,
+    "precompute3d": bench_precompute3d,
+    "second_law": bench_second_law,
+    "update2d": bench_update2d,
+    "animate3d": bench_animate3d,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Names of results that are worse than the baseline by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "value" not in base or "value" not in result:
+            continue
+        ratio = result["value"] / base["value"]
+        if not result["higher_is_better"]:
+            ratio = 1 / ratio
+        change = (ratio - 1) * 100
+        status = "REGRESSION" if ratio < 1 - tolerance else "ok"
+        print(f"{name:32s} {base['value']:12.4g} -> {result['value']:12.4g} {result['unit']:10s} {change:+7.1f}%  {status}")
+        if status == "REGRESSION":
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="previous results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown as a fraction (default 0.10)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=float, default=1.0, help="shrink (<1) or grow workloads")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="run a subset of benchmarks")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...")
+        BENCHMARKS[name](results, args.repeats, args.scale)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": args.repeats,
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
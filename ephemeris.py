@@ -0,0 +1,134 @@
+import numpy as np
+from numpy.polynomial import chebyshev
+
+# default fit tolerance in metres and polynomial degree per segment
+DEFAULT_TOLERANCE = 1e6
+DEFAULT_DEGREE = 10
+
+
+class BodyEphemeris:
+    """Chebyshev segments covering one body's trajectory.
+
+    starts/ends hold the time span of each segment; coeffs has shape (segments, degree + 1, dims)
+    for the position on the span mapped to [-1, 1], and vel_coeffs the matching derivative
+    already scaled to metres per second.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, coeffs: np.ndarray, max_error: float):
+        self.starts = starts
+        self.ends = ends
+        self.coeffs = coeffs
+        self.max_error = max_error
+
+        half_span = 0.5 * (ends - starts)
+        vel = chebyshev.chebder(coeffs, axis=1) / half_span[:, None, None]
+        self.vel_coeffs = np.concatenate([vel, np.zeros_like(coeffs[:, :1])], axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.starts.nbytes + self.ends.nbytes + self.coeffs.nbytes
+
+    def _locate(self, t):
+        t = np.asarray(t, dtype=float)
+        seg = np.clip(np.searchsorted(self.starts, t, side="right") - 1, 0, len(self.starts) - 1)
+        start, end = self.starts[seg], self.ends[seg]
+        x = np.clip((2 * t - start - end) / (end - start), -1.0, 1.0)
+        return seg, x
+
+    def position(self, t) -> np.ndarray:
+        """Positions at time(s) t, shape t.shape + (dims,). Times outside the fit are clamped."""
+        seg, x = self._locate(t)
+        return _clenshaw(self.coeffs[seg], x)
+
+    def velocity(self, t) -> np.ndarray:
+        seg, x = self._locate(t)
+        return _clenshaw(self.vel_coeffs[seg], x)
+
+
+def _clenshaw(coeffs: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Evaluate a different Chebyshev series per query point; coeffs is x.shape + (degree + 1, dims)."""
+    x = x[..., None]
+    b1 = np.zeros(coeffs.shape[:-2] + coeffs.shape[-1:])
+    b2 = np.zeros_like(b1)
+    for k in range(coeffs.shape[-2] - 1, 0, -1):
+        b1, b2 = coeffs[..., k, :] + 2 * x * b1 - b2, b1
+    return coeffs[..., 0, :] + x * b1 - b2
+
+
+def fit_body(times, positions, tolerance: float = DEFAULT_TOLERANCE, degree: int = DEFAULT_DEGREE) -> BodyEphemeris:
+    """Fit Chebyshev segments to one body's samples, halving any segment that misses a sample by more than tolerance."""
+    times = np.asarray(times, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    dims = positions.shape[1]
+
+    segments = []
+    max_error = 0.0
+    stack = [(0, len(times) - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        t, p = times[lo:hi + 1], positions[lo:hi + 1]
+        if len(t) < 2:
+            coeffs = np.zeros((degree + 1, dims))
+            coeffs[0] = p[0]
+            segments.append((t[0], t[0] + 1.0, coeffs))
+            continue
+
+        # short segments are interpolated exactly with a lower degree
+        deg = min(degree, len(t) - 1)
+        x = (2 * t - t[0] - t[-1]) / (t[-1] - t[0])
+        fit = chebyshev.chebfit(x, p, deg)
+        error = np.max(np.linalg.norm(chebyshev.chebval(x, fit).T - p, axis=1))
+
+        if error > tolerance and len(t) > deg + 1:
+            # split at the sample nearest the middle; both halves share it so the curve stays joined
+            mid = lo + int(np.clip(np.searchsorted(t, 0.5 * (t[0] + t[-1])), 1, len(t) - 2))
+            stack.append((mid, hi))
+            stack.append((lo, mid))
+            continue
+
+        coeffs = np.zeros((degree + 1, dims))
+        coeffs[:deg + 1] = fit
+        segments.append((t[0], t[-1], coeffs))
+        max_error = max(max_error, error)
+
+    segments.sort(key=lambda s: s[0])
+    return BodyEphemeris(
+        np.array([s[0] for s in segments]),
+        np.array([s[1] for s in segments]),
+        np.array([s[2] for s in segments]),
+        max_error,
+    )
+
+
+class ChebyshevEphemeris:
+    """Smooth, compact position/velocity lookups for every body of an integrated trajectory."""
+
+    def __init__(self, bodies: list[BodyEphemeris]):
+        self.bodies = bodies
+
+    @classmethod
+    def fit(cls, samples: list[tuple[np.ndarray, np.ndarray]], tolerance: float = DEFAULT_TOLERANCE, degree: int = DEFAULT_DEGREE):
+        """samples holds a (times, positions) pair per body, as returned by scenario_cache.body_samples."""
+        return cls([fit_body(times, positions, tolerance, degree) for times, positions in samples])
+
+    @property
+    def start(self) -> float:
+        return max(body.starts[0] for body in self.bodies)
+
+    @property
+    def end(self) -> float:
+        return min(body.ends[-1] for body in self.bodies)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(body.nbytes for body in self.bodies)
+
+    def position(self, i: int, t) -> np.ndarray:
+        return self.bodies[i].position(t)
+
+    def velocity(self, i: int, t) -> np.ndarray:
+        return self.bodies[i].velocity(t)
+
+    def positions(self, t: float) -> np.ndarray:
+        """Positions of every body at one time, shape (bodies, dims)."""
+        return np.array([body.position(t) for body in self.bodies])
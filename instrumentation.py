@@ -0,0 +1,109 @@
+"""Opt-in timers, call counters and frame-time histograms for the simulation loops.
+
+Everything is off by default; instrumented code only pays for one attribute
+check per call. Turn it on with `PROFILER.enable()` or by setting the
+ORBITS_PROFILE environment variable (to 1, or to a file path for a JSON dump)
+before starting a run.
+"""
+import atexit
+import json
+import math
+import os
+import sys
+from time import perf_counter
+
+# frame-time histogram buckets are powers of two in milliseconds, from <0.125ms up
+HISTOGRAM_MIN_EXP = -3
+HISTOGRAM_MAX_EXP = 12
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.counts = {}
+        self.histograms = {}
+        self._dump_registered = False
+
+    def enable(self, dump_path=None, dump_on_exit: bool = True):
+        self.enabled = True
+        if dump_on_exit and not self._dump_registered:
+            atexit.register(self.dump, dump_path)
+            self._dump_registered = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.timers.clear()
+        self.counts.clear()
+        self.histograms.clear()
+
+    def lap(self, phase: str, start: float) -> float:
+        """Charge the time since start to phase and return now, so laps can be chained."""
+        now = perf_counter()
+        self.timers[phase] = self.timers.get(phase, 0.0) + (now - start)
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        return now
+
+    def count(self, name: str, n: int = 1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def record_frame(self, name: str, seconds: float):
+        ms = seconds * 1000
+        exp = math.floor(math.log2(ms)) if ms > 0 else HISTOGRAM_MIN_EXP
+        exp = min(max(exp, HISTOGRAM_MIN_EXP), HISTOGRAM_MAX_EXP)
+        hist = self.histograms.setdefault(name, {})
+        hist[exp] = hist.get(exp, 0) + 1
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def report(self) -> dict:
+        phases = {}
+        for name in sorted(set(self.timers) | set(self.counts)):
+            total = self.timers.get(name)
+            calls = self.counts.get(name, 0)
+            entry = {"calls": calls}
+            if total is not None:
+                entry["total_s"] = total
+                entry["mean_us"] = total / calls * 1e6 if calls else 0.0
+            phases[name] = entry
+
+        histograms = {}
+        for name, hist in self.histograms.items():
+            # keys are the upper edge of each bucket in milliseconds; the top bucket also holds
+            # every slower frame, so it is labelled by its lower edge
+            histograms[name] = {
+                (f">={2.0 ** exp:g}ms" if exp == HISTOGRAM_MAX_EXP else f"<{2.0 ** (exp + 1):g}ms"): hist[exp]
+                for exp in sorted(hist)
+            }
+        return {"phases": phases, "frame_histograms": histograms}
+
+    def summary(self) -> str:
+        report = self.report()
+        lines = [f"{'phase':36s} {'calls':>10s} {'total s':>10s} {'mean us':>10s}"]
+        for name, entry in report["phases"].items():
+            lines.append(
+                f"{name:36s} {entry['calls']:10d} {entry.get('total_s', 0.0):10.3f} {entry.get('mean_us', 0.0):10.1f}"
+            )
+        for name, hist in report["frame_histograms"].items():
+            lines.append(f"{name} frame times:")
+            for bucket, n in hist.items():
+                lines.append(f"  {bucket:>10s} {n}")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        if not self.timers and not self.counts:
+            return
+        if path:
+            with open(path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+        else:
+            print(self.summary(), file=sys.stderr)
+
+
+PROFILER = Profiler()
+
+_env = os.environ.get("ORBITS_PROFILE")
+if _env and _env != "0":
+    PROFILER.enable(dump_path=None if _env == "1" else _env)
@@ -1,38 +1,295 @@
 import math
+from functools import lru_cache
+
+import numpy as np
 
 G=9.81
 GOAL_HEIGHT=3.048
 m=0.173863
 b=9.79369
 
+MIN_ANGLE=5
+MAX_ANGLE=85
+
+# projectile and air properties for the drag-aware solver
+RHO_AIR=1.225
+BALL_MASS=0.27
+BALL_DIAMETER=0.24
+DRAG_COEFF=0.47
+LIFT_COEFF=0.0  # magnus lift from backspin, 0 for a non-spinning ball
+DRAG_DT=0.004
+DISTANCE_RESOLUTION=0.01  # drag solutions are cached per centimetre
+DRAG_BATCH=64  # distances whose trajectory grids are integrated together
+DRAG_SPREAD=1.2  # largest ratio of vacuum launch speeds sharing one coarse grid
+
 def v_from_psi(psi):
     return m*psi+b
 
 def psi_from_v(v):
     return (v-b)/m
 
+def launch_speed(distance, angle):
+    """Speed needed to pass through (distance, GOAL_HEIGHT) at angle (radians), nan if unreachable."""
+    distance = np.asarray(distance, dtype=float)
+    cos_th = np.cos(angle)
+    denom = 2*cos_th**2*(distance*np.tan(angle)-GOAL_HEIGHT)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v_squared = np.where(denom > 0, G*distance**2/denom, np.nan)
+    return np.sqrt(v_squared)
+
+def find_angle_psi_batch(distances):
+    """Continuous optimal launch angle (degrees) and psi for an array of distances.
+
+    Minimising v^2 = g d^2 / (2 cos^2(th) (d tan(th) - h)) gives th = 45deg + atan(h/d)/2
+    and v^2 = g (h + sqrt(h^2 + d^2)). psi is linear in v, so that angle also minimises psi.
+    For short shots even the minimum speed needs psi <= 0; psi is then floored at exactly 0
+    and the flatter of the two angles where v = b is returned. (The old integer search
+    required psi > 0 and could pick the steep side, e.g. 79deg at 3 m instead of 56.8deg.)
+    Distances with no solution inside [MIN_ANGLE, MAX_ANGLE] come back as nan.
+    """
+    d = np.asarray(distances, dtype=float)
+    h = GOAL_HEIGHT
+    lo, hi = math.radians(MIN_ANGLE), math.radians(MAX_ANGLE)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angle = np.clip(np.pi/4 + 0.5*np.arctan2(h, d), lo, hi)
+        v = launch_speed(d, angle)
+
+        # below psi = 0: solve v(th) = b, i.e. R sin(2 th - phi) = g d^2 / b^2 + h
+        low = v <= b
+        R = np.hypot(d, h)
+        k = (G*d**2/b**2 + h)/R
+        root = 0.5*(np.arctan2(h, d) + np.arcsin(np.clip(k, -1, 1)))
+        angle = np.where(low, root, angle)
+        v = np.where(low, b, v)
+
+    valid = (d > 0) & np.isfinite(v) & (angle >= lo - 1e-12) & (angle <= hi + 1e-12)
+    return np.where(valid, np.degrees(angle), np.nan), np.where(valid, psi_from_v(v), np.nan)
+
 def find_angle_psi(distance):
-    best_angle=None
-    best_psi=float('inf')
-    for deg in range(5,85):
-        th=math.radians(deg)
-        cos_th=math.cos(th)
-        sin_th=math.sin(th)
-        tan_th=math.tan(th)
-        
-        # Calculate velocity needed to pass through (distance, GOAL_HEIGHT)
-        v_squared = (G*distance**2)/(2*cos_th**2*(distance*tan_th-GOAL_HEIGHT))
-        
-        # Check if solution is valid (no negative under square root)
-        if v_squared > 0:
-            v = math.sqrt(v_squared)
-            psi = psi_from_v(v)
-            if 0 < psi < best_psi:
-                best_psi = psi
-                best_angle = deg
-                
-    if best_angle is None:
+    angle, psi = find_angle_psi_batch(distance)
+    if np.isnan(angle):
+        raise ValueError("no solution")
+    return float(angle), float(psi)
+
+def _crossing_heights(targets, angles, speeds, drag_coeff=DRAG_COEFF, lift_coeff=LIFT_COEFF, dt=DRAG_DT):
+    """Heights at which trajectory i crosses each of its ascending distances targets[i], shape (n, k).
+
+    angles (radians) and speeds are flat arrays of n launches, all stepped at once with a midpoint
+    (RK2) integrator under gravity, quadratic drag and lift perpendicular to the velocity.
+    Finished trajectories are dropped from the working arrays as the batch goes. Distances a
+    trajectory never reaches before hitting the ground come back as nan.
+    """
+    area = math.pi*(BALL_DIAMETER/2)**2
+    k_drag = 0.5*RHO_AIR*drag_coeff*area/BALL_MASS
+    k_lift = 0.5*RHO_AIR*lift_coeff*area/BALL_MASS
+
+    def accel(vx, vy):
+        speed = np.sqrt(vx*vx + vy*vy)
+        ax = -k_drag*speed*vx - k_lift*speed*vy
+        ay = -k_drag*speed*vy + k_lift*speed*vx - G
+        return ax, ay
+
+    n, k_max = targets.shape
+    heights = np.full((n, k_max), np.nan)
+    # rows of the working arrays index into heights; k is the next target of each row, whose
+    # distance is kept in target (inf once every target is passed)
+    rows = np.flatnonzero(speeds*np.cos(angles) > 0)
+    k = np.zeros(len(rows), dtype=int)
+    target = targets[rows, 0]
+    x = np.zeros(len(rows))
+    y = np.zeros(len(rows))
+    vx = speeds[rows]*np.cos(angles[rows])
+    vy = speeds[rows]*np.sin(angles[rows])
+
+    while len(rows):
+        ax, ay = accel(vx, vy)
+        mvx, mvy = vx + 0.5*dt*ax, vy + 0.5*dt*ay
+        max_, may = accel(mvx, mvy)
+        new_x, new_y = x + dt*mvx, y + dt*mvy
+        vx, vy = vx + dt*max_, vy + dt*may
+
+        # one step can pass several targets
+        crossed = new_x >= target
+        while crossed.any():
+            t = (target[crossed] - x[crossed])/(new_x[crossed] - x[crossed])
+            heights[rows[crossed], k[crossed]] = y[crossed] + (new_y[crossed] - y[crossed])*t
+            k[crossed] += 1
+            passed = k[crossed] >= k_max
+            target[crossed] = np.where(passed, np.inf, targets[rows[crossed], np.minimum(k[crossed], k_max - 1)])
+            crossed = new_x >= target
+        x, y = new_x, new_y
+        active = np.isfinite(target) & ((y >= 0) | (vy > 0)) & (vx > 0)
+        if not active.all():
+            rows, k, target = rows[active], k[active], target[active]
+            x, y, vx, vy = x[active], y[active], vx[active], vy[active]
+    return heights
+
+def height_at_distance(distance, angles, speeds, **model):
+    """Height at which each (angle, speed) trajectory crosses its distance, integrated as one batch.
+
+    distance, angles (radians) and speeds broadcast together, so every trajectory can have its
+    own target distance. Trajectories that hit the ground first come back as nan.
+    """
+    distance, angles, speeds = np.broadcast_arrays(
+        np.asarray(distance, dtype=float), np.asarray(angles, dtype=float), np.asarray(speeds, dtype=float))
+    heights = _crossing_heights(distance.reshape(-1, 1), angles.ravel(), speeds.ravel(), **model)
+    return heights.reshape(angles.shape)
+
+def heights_at_distances(distances, angles, speeds, **model):
+    """Heights of every (angle, speed) trajectory at each of the ascending distances, shape (..., len(distances)).
+
+    Each trajectory is integrated once however many distances it is evaluated at.
+    """
+    angles, speeds = np.broadcast_arrays(np.asarray(angles, dtype=float), np.asarray(speeds, dtype=float))
+    targets = np.broadcast_to(np.asarray(distances, dtype=float), (angles.size, len(distances)))
+    heights = _crossing_heights(targets, angles.ravel(), speeds.ravel(), **model)
+    return heights.reshape(angles.shape + (len(distances),))
+
+def _min_speeds(heights, speeds):
+    """Lowest speed along the last axis of an (..., speeds) grid of heights that reaches GOAL_HEIGHT."""
+    speeds = np.broadcast_to(speeds, heights.shape)
+    above = np.nan_to_num(heights, nan=-np.inf) >= GOAL_HEIGHT
+    first = np.argmax(above, axis=-1)[..., None]
+    # a row that already reaches at its first speed is pinned to that speed (the psi = 0 floor)
+    found = np.take_along_axis(above, first, -1)[..., 0]
+
+    # interpolate between the last speed that falls short and the first one that reaches
+    prev = np.maximum(first - 1, 0)
+    h0 = np.nan_to_num(np.take_along_axis(heights, prev, -1)[..., 0], nan=0.0)
+    h1 = np.take_along_axis(heights, first, -1)[..., 0]
+    s0 = np.take_along_axis(speeds, prev, -1)[..., 0]
+    s1 = np.take_along_axis(speeds, first, -1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip((GOAL_HEIGHT - h0)/(h1 - h0), 0, 1)
+    return np.where(found, s0 + (s1 - s0)*t, np.nan)
+
+def _best_angle(angles, speeds):
+    """Angle and speed of the lowest entry of one row, refined with a parabola through its neighbours."""
+    best = np.nanargmin(speeds)
+    angle, v = angles[best], speeds[best]
+    if 0 < best < len(speeds) - 1 and v > b:
+        v_lo, v_hi = speeds[best - 1], speeds[best + 1]
+        curvature = v_lo - 2*v + v_hi
+        if curvature > 0:
+            offset = 0.5*(v_lo - v_hi)/curvature
+            angle += offset*(angles[1] - angles[0])
+            v -= 0.25*(v_lo - v_hi)*offset
+    return math.degrees(angle), float(psi_from_v(v))
+
+def find_angle_psi_drag(distance, **model):
+    """Angle (degrees) and psi with drag and lift, searching all candidate angles and speeds at once.
+
+    Solutions are cached per DISTANCE_RESOLUTION, so repeated queries are dictionary lookups.
+    """
+    if model:
+        angle, psi = find_angle_psi_drag_batch([distance], **model)
+    else:
+        angle, psi = _find_angle_psi_drag_cached(round(distance/DISTANCE_RESOLUTION))
+    if np.isnan(angle[0]):
         raise ValueError("no solution")
-    return best_angle, best_psi
+    return float(angle[0]), float(psi[0])
+
+@lru_cache(maxsize=4096)
+def _find_angle_psi_drag_cached(distance_bin):
+    return find_angle_psi_drag_batch([distance_bin*DISTANCE_RESOLUTION])
+
+def find_angle_psi_drag_batch(distances, **model):
+    """Drag-aware angle (degrees) and psi for an array of distances, nan where there is no solution.
+
+    Distances are sorted and grouped into chunks of up to DRAG_BATCH whose vacuum launch speeds
+    differ by at most DRAG_SPREAD. One coarse angle x speed family of trajectories per chunk is
+    integrated once and evaluated at every distance of the chunk, which brackets the minimum
+    launch speed for every angle; a second, finer family spanning each distance's window around
+    its best angle refines it and is likewise integrated once for the whole chunk.
+    """
+    distances = np.atleast_1d(np.asarray(distances, dtype=float))
+    angles = np.full(distances.shape, np.nan)
+    psis = np.full(distances.shape, np.nan)
+    order = np.argsort(distances)
+    v_vac = _vacuum_speed(distances[order])
+    lo = 0
+    while lo < len(order):
+        hi = lo + 1
+        while hi < len(order) and hi - lo < DRAG_BATCH and v_vac[hi] <= DRAG_SPREAD*v_vac[lo]:
+            hi += 1
+        chunk = order[lo:hi]
+        angles[chunk], psis[chunk] = _solve_drag(distances[chunk], **model)
+        lo = hi
+    return angles, psis
+
+def _vacuum_speed(distances):
+    return np.sqrt(G*(GOAL_HEIGHT + np.hypot(GOAL_HEIGHT, distances)))
+
+def _solve_drag(distances, **model):
+    """Drag solutions for ascending distances whose vacuum speeds are close enough to share a coarse grid."""
+    v_vac = _vacuum_speed(distances)
+
+    # speeds start at psi = 0, the slowest launch the v_from_psi fit allows
+    angles = np.radians(np.arange(MIN_ANGLE, MAX_ANGLE + 1, 2.0))
+    speeds = np.linspace(max(0.5*v_vac[0], b), 3*v_vac[-1], 48)
+    heights = heights_at_distances(distances, angles[:, None], speeds, **model)
+    coarse = _min_speeds(np.moveaxis(heights, -1, 0), speeds)
+    solved = ~np.all(np.isnan(coarse), axis=1)
+
+    # one finer family covering every solved distance's window around its best coarse angle, with
+    # the same 0.2 deg and ~0.3 % speed spacing a per-distance grid of 21 x 32 would have
+    rows = np.flatnonzero(solved)
+    if len(rows):
+        best = angles[np.nanargmin(coarse[rows], axis=1)]
+        fine_angles = np.arange(
+            max(best.min() - math.radians(2), math.radians(MIN_ANGLE)),
+            min(best.max() + math.radians(2), math.radians(MAX_ANGLE)) + 1e-9,
+            math.radians(0.2))
+        v_est = np.array([
+            np.interp(fine_angles, angles[~np.isnan(c)], c[~np.isnan(c)]) for c in coarse[rows]
+        ])
+        v_lo, v_hi = max(0.95*v_est.min(), b), max(1.05*v_est.max(), b)
+        count = min(max(32, math.ceil(math.log(v_hi/v_lo)/math.log(1 + 0.1/31)) + 1), 512)
+        fine_speeds = np.geomspace(v_lo, v_hi, count)
+        fine_heights = heights_at_distances(distances[rows], fine_angles[:, None], fine_speeds, **model)
+        fine = _min_speeds(np.moveaxis(fine_heights, -1, 0), fine_speeds)
+
+    result_angles = np.full(len(distances), np.nan)
+    result_psis = np.full(len(distances), np.nan)
+    for j, i in enumerate(rows):
+        if np.all(np.isnan(fine[j])):
+            result_angles[i], result_psis[i] = _best_angle(angles, coarse[i])
+        else:
+            result_angles[i], result_psis[i] = _best_angle(fine_angles, fine[j])
+    return result_angles, result_psis
+
+class AngleTable:
+    """Precomputed distance -> (angle, psi) table with linear interpolation for fast lookups.
+
+    Pass solver=find_angle_psi_drag_batch to tabulate the drag-aware solution instead; that
+    integrates trajectories, so the default 2048 samples take several seconds to build.
+    """
+
+    def __init__(self, min_distance=1.0, max_distance=30.0, samples=2048, solver=find_angle_psi_batch):
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.distances = np.linspace(min_distance, max_distance, samples)
+        self.angles, self.psis = solver(self.distances)
+        self._step = (max_distance - min_distance)/(samples - 1)
+        # plain lists are faster than numpy indexing for single lookups
+        self._angle_list = self.angles.tolist()
+        self._psi_list = self.psis.tolist()
+
+    def lookup(self, distance):
+        """Constant-time interpolated (angle, psi) for one distance inside the table range."""
+        if not self.min_distance <= distance <= self.max_distance:
+            raise ValueError(f"distance {distance} outside table range [{self.min_distance}, {self.max_distance}]")
+        pos = (distance - self.min_distance)/self._step
+        i = min(int(pos), len(self._angle_list) - 2)
+        t = pos - i
+        a = self._angle_list[i] + (self._angle_list[i+1] - self._angle_list[i])*t
+        p = self._psi_list[i] + (self._psi_list[i+1] - self._psi_list[i])*t
+        return a, p
+
+    def lookup_batch(self, distances):
+        distances = np.asarray(distances, dtype=float)
+        return np.interp(distances, self.distances, self.angles), np.interp(distances, self.distances, self.psis)
 
-print(find_angle_psi(30))
+if __name__ == '__main__':
+    print(find_angle_psi(30))
@@ -1,5 +1,15 @@
 import matplotlib.pyplot as plt
 import math
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Optional
+
+import numpy as np
+
+from instrumentation import PROFILER
+
+# particles per work item when stepping particle arrays
+PARTICLE_CHUNK = 16384
 
 class Planet:
     def __init__(self, name: str, mass: float, position: list[float], velocity: list[float], color: str = 'blue'):
@@ -9,17 +19,68 @@ class Planet:
         self.velocity = velocity
         self.color = color
 
+class Particles:
+    """Massless test particles kept as host-relative offsets in float64 numpy arrays.
+
+    In a compensated System the Kahan residuals live in offset_error/velocity_error.
+    """
+
+    def __init__(self, offsets, velocities, color: str = 'white'):
+        self.offsets = np.array(offsets, dtype=np.float64)
+        self.velocities = np.array(velocities, dtype=np.float64)
+        self.color = color
+        self.offset_error: Optional[np.ndarray] = None
+        self.velocity_error: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def positions(self, host: Planet) -> np.ndarray:
+        return self.offsets + np.asarray(host.position[:self.offsets.shape[1]], dtype=np.float64)
+
+
+def _kahan_add(values: np.ndarray, errors: np.ndarray, increment: np.ndarray):
+    """values += increment in place, carrying the lost low-order bits in errors (exact = values - errors)."""
+    y = increment - errors
+    total = values + y
+    errors[...] = (total - values) - y
+    values[...] = total
+
+
+def _kahan_add_scalar(values: list[float], errors: list[float], k: int, increment: float):
+    y = increment - errors[k]
+    total = values[k] + y
+    errors[k] = (total - values[k]) - y
+    values[k] = total
+
+
 class System:
-    def __init__(self, host: Planet, planets: list[Planet]):
+    def __init__(
+        self,
+        host: Planet,
+        planets: list[Planet],
+        particles: Optional[Particles] = None,
+        compensated: bool = False,
+        threads: int = 1,
+    ):
         self.host = host
         self.planets = planets
+        self.particles = particles
+        # compensated (Kahan) summation of position and velocity updates for very long runs
+        self.compensated = compensated
+        # worker threads for particle chunks; results do not depend on this
+        self.threads = threads
+        self._position_error = None
+        self._velocity_error = None
+        self._executor = None
+        self._executor_threads = 0
 
-    def step_forward(self, dt: float):
-        """Velocity Verlet integrator in two dimensions."""
+    def _accelerations(self, planets: Optional[list[Planet]] = None) -> list[tuple[float, float]]:
+        """Host-only acceleration of every planet (or of the given subset), in one loop as this is the hottest code."""
         G = 6.67430e-11
 
         accelerations = []
-        for planet in self.planets:
+        for planet in self.planets if planets is None else planets:
             rx = planet.position[0] - self.host.position[0]
             ry = planet.position[1] - self.host.position[1]
             r = math.hypot(rx, ry)
@@ -27,6 +88,131 @@ class System:
             ax = -G * self.host.mass * rx / r_cubed
             ay = -G * self.host.mass * ry / r_cubed
             accelerations.append((ax, ay))
+        return accelerations
+
+    def _particle_accelerations(self, offsets: np.ndarray) -> np.ndarray:
+        G = 6.67430e-11
+
+        r_squared = np.einsum('ij,ij->i', offsets, offsets)
+        r_cubed = r_squared * np.sqrt(r_squared)
+        r_cubed[r_cubed == 0] = 1e-30
+        return -G * self.host.mass * offsets / r_cubed[:, None]
+
+    def step_forward(self, dt: float):
+        """Velocity Verlet integrator in two dimensions."""
+        if self.compensated:
+            self._step_planets_compensated(dt)
+        else:
+            self._step_planets(dt)
+        if self.particles is not None and len(self.particles):
+            self._step_particles(dt)
+
+    def timestep_levels(self, dt: float, min_dt: float) -> list[int]:
+        """Power-of-two bin for every planet: planet i steps every 2**levels[i] sub-steps.
+
+        The block dt is split into ceil(dt / min_dt) sub-steps. The planet with the shortest
+        dynamical timescale sqrt(r^3 / GM) gets bin 0 and steps on every one; every doubling of
+        another planet's timescale moves it one bin coarser, up to the bin that steps once per block.
+        """
+        G = 6.67430e-11
+
+        if not self.planets:
+            return []
+        coarsest = math.ceil(dt / min_dt).bit_length() - 1
+        timescales = []
+        for planet in self.planets:
+            r = math.hypot(planet.position[0] - self.host.position[0], planet.position[1] - self.host.position[1])
+            timescales.append(math.sqrt(r**3 / (G * self.host.mass)) if r else 0.0)
+        shortest = min(timescales) or 1e-30
+        return [
+            min(math.floor(math.log2(max(tau, shortest) / shortest)), coarsest)
+            for tau in timescales
+        ]
+
+    def step_forward_block(self, dt: float, min_dt: float):
+        """Advance by dt with hierarchical block time-steps (see timestep_levels).
+
+        The block is split into ceil(dt / min_dt) sub-steps, the same count the uniform loop
+        would take; on each one only the bins whose stride divides it get their velocity Verlet
+        kick-drift-kick, so slow outer planets take a fraction of the steps of the inner ones.
+        When a stride does not divide the block, that bin's last step is shortened to end on the
+        block boundary. Every planet only feels the host, so no bin needs positions of another
+        between its own steps. Bins are reassigned at the start of every block. Particles are
+        stepped on every sub-step.
+        """
+        levels = self.timestep_levels(dt, min_dt)
+        coarsest = max(levels, default=0)
+        sub_steps = math.ceil(dt / min_dt)
+        sub_dt = dt / sub_steps
+
+        profiling = PROFILER.enabled
+        if profiling:
+            start = perf_counter()
+
+        # the closing kick of one step reuses its acceleration as the opening kick of the next
+        accelerations = self._accelerations()
+        strides = [2**level for level in levels]
+        if self.compensated and (self._position_error is None or len(self._position_error) != len(self.planets)):
+            self._position_error = [[0.0, 0.0] for _ in self.planets]
+            self._velocity_error = [[0.0, 0.0] for _ in self.planets]
+        if profiling:
+            start = PROFILER.lap("step_block.forces", start)
+
+        # on sub-step sub, every bin whose stride divides sub is due: with 2**z the largest power
+        # of two dividing sub, those are the planets with stride <= 2**z
+        steps = [sub_dt * stride for stride in strides]
+        last_subs = [(sub_steps - 1) // stride * stride for stride in strides]
+        last_steps = [sub_dt * (sub_steps - last_sub) for last_sub in last_subs]
+        due_by_zeros = [
+            [idx for idx, stride in enumerate(strides) if stride <= 2**zeros] for zeros in range(coarsest + 1)
+        ]
+        due_planets_by_zeros = [[self.planets[idx] for idx in due] for due in due_by_zeros]
+        for sub in range(sub_steps):
+            zeros = min((sub & -sub).bit_length() - 1, coarsest) if sub else coarsest
+            due = due_by_zeros[zeros]
+            for idx in due:
+                planet = self.planets[idx]
+                step = steps[idx] if sub < last_subs[idx] else last_steps[idx]
+                half_dt = 0.5 * step
+                acc = accelerations[idx]
+                if self.compensated:
+                    pos_err, vel_err = self._position_error[idx], self._velocity_error[idx]
+                    for k in range(2):
+                        _kahan_add_scalar(planet.velocity, vel_err, k, acc[k] * half_dt)
+                        _kahan_add_scalar(planet.position, pos_err, k, planet.velocity[k] * step)
+                else:
+                    planet.velocity[0] += acc[0] * half_dt
+                    planet.velocity[1] += acc[1] * half_dt
+                    planet.position[0] += planet.velocity[0] * step
+                    planet.position[1] += planet.velocity[1] * step
+
+            new_accelerations = self._accelerations(due_planets_by_zeros[zeros])
+            for idx, acc in zip(due, new_accelerations):
+                accelerations[idx] = acc
+                planet = self.planets[idx]
+                half_dt = 0.5 * (steps[idx] if sub < last_subs[idx] else last_steps[idx])
+                if self.compensated:
+                    vel_err = self._velocity_error[idx]
+                    for k in range(2):
+                        _kahan_add_scalar(planet.velocity, vel_err, k, acc[k] * half_dt)
+                else:
+                    planet.velocity[0] += acc[0] * half_dt
+                    planet.velocity[1] += acc[1] * half_dt
+
+            if self.particles is not None and len(self.particles):
+                self._step_particles(sub_dt)
+        if profiling:
+            PROFILER.lap("step_block.steps", start)
+            PROFILER.count("step_block.planet_steps", sum(-(-sub_steps // stride) for stride in strides))
+
+    def _step_planets(self, dt: float):
+        profiling = PROFILER.enabled
+        if profiling:
+            start = perf_counter()
+
+        accelerations = self._accelerations()
+        if profiling:
+            start = PROFILER.lap("step_forward.forces", start)
 
         half_dt = 0.5 * dt
 
@@ -37,21 +223,107 @@ class System:
 
             planet.position[0] += planet.velocity[0] * dt
             planet.position[1] += planet.velocity[1] * dt
+        if profiling:
+            start = PROFILER.lap("step_forward.kick_drift", start)
 
-        new_accelerations = []
-        for planet in self.planets:
-            rx = planet.position[0] - self.host.position[0]
-            ry = planet.position[1] - self.host.position[1]
-            r = math.hypot(rx, ry)
-            r_cubed = r**3 if r else 1e-30
-            ax = -G * self.host.mass * rx / r_cubed
-            ay = -G * self.host.mass * ry / r_cubed
-            new_accelerations.append((ax, ay))
+        new_accelerations = self._accelerations()
+        if profiling:
+            start = PROFILER.lap("step_forward.forces", start)
 
         for idx, planet in enumerate(self.planets):
             new_acc = new_accelerations[idx]
             planet.velocity[0] += new_acc[0] * half_dt
             planet.velocity[1] += new_acc[1] * half_dt
+        if profiling:
+            PROFILER.lap("step_forward.kick", start)
+
+    def _step_planets_compensated(self, dt: float):
+        """Same Verlet step with every position and velocity update Kahan-summed."""
+        if self._position_error is None or len(self._position_error) != len(self.planets):
+            self._position_error = [[0.0, 0.0] for _ in self.planets]
+            self._velocity_error = [[0.0, 0.0] for _ in self.planets]
+
+        profiling = PROFILER.enabled
+        if profiling:
+            start = perf_counter()
+
+        accelerations = self._accelerations()
+        if profiling:
+            start = PROFILER.lap("step_forward.forces", start)
+
+        half_dt = 0.5 * dt
+
+        for idx, planet in enumerate(self.planets):
+            pos_err, vel_err = self._position_error[idx], self._velocity_error[idx]
+            for k in range(2):
+                _kahan_add_scalar(planet.velocity, vel_err, k, accelerations[idx][k] * half_dt)
+                _kahan_add_scalar(planet.position, pos_err, k, planet.velocity[k] * dt)
+        if profiling:
+            start = PROFILER.lap("step_forward.kick_drift", start)
+
+        new_accelerations = self._accelerations()
+        if profiling:
+            start = PROFILER.lap("step_forward.forces", start)
+
+        for idx, planet in enumerate(self.planets):
+            vel_err = self._velocity_error[idx]
+            for k in range(2):
+                _kahan_add_scalar(planet.velocity, vel_err, k, new_accelerations[idx][k] * half_dt)
+        if profiling:
+            PROFILER.lap("step_forward.kick", start)
+
+    def _step_particles(self, dt: float):
+        profiling = PROFILER.enabled
+        if profiling:
+            start = perf_counter()
+
+        p = self.particles
+        if self.compensated and p.offset_error is None:
+            p.offset_error = np.zeros_like(p.offsets)
+            p.velocity_error = np.zeros_like(p.velocities)
+
+        # chunk boundaries depend only on PARTICLE_CHUNK, never on the thread count, and every
+        # particle only depends on the host, so results are identical for any number of threads
+        bounds = [(lo, min(lo + PARTICLE_CHUNK, len(p))) for lo in range(0, len(p), PARTICLE_CHUNK)]
+        if self.threads > 1 and len(bounds) > 1:
+            list(self._pool().map(lambda b: self._step_particle_chunk(b[0], b[1], dt), bounds))
+        else:
+            for lo, hi in bounds:
+                self._step_particle_chunk(lo, hi, dt)
+        if profiling:
+            PROFILER.lap("step_forward.particles", start)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None or self._executor_threads != self.threads:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = ThreadPoolExecutor(max_workers=self.threads)
+            self._executor_threads = self.threads
+        return self._executor
+
+    def close(self):
+        """Shut down the particle worker threads; stepping again starts a fresh pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_threads = 0
+
+    def _step_particle_chunk(self, lo: int, hi: int, dt: float):
+        """Velocity Verlet step for particles lo:hi; numpy releases the GIL inside each array operation."""
+        p = self.particles
+        half_dt = 0.5 * dt
+        offsets, velocities = p.offsets[lo:hi], p.velocities[lo:hi]
+        if self.compensated:
+            offset_error, velocity_error = p.offset_error[lo:hi], p.velocity_error[lo:hi]
+            # forces and drifts use the compensated values, not just the stored ones
+            _kahan_add(velocities, velocity_error, self._particle_accelerations(offsets - offset_error) * half_dt)
+            _kahan_add(offsets, offset_error, (velocities - velocity_error) * dt)
+            _kahan_add(velocities, velocity_error, self._particle_accelerations(offsets - offset_error) * half_dt)
+        else:
+            # the chunks are views, so updating them in place writes straight into the particle arrays
+            velocities += self._particle_accelerations(offsets) * half_dt
+            offsets += velocities * dt
+            velocities += self._particle_accelerations(offsets) * half_dt
 
     def plot_orbits(self):
         fig, ax = plt.subplots(figsize=(10, 10))
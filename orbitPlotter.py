@@ -2,7 +2,13 @@ from models import Planet, System
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import math
+import sys
+from time import perf_counter
 from plotter3d import Planet3d, System3d
+from scenario_cache import Scenario, body_samples, load_or_run
+from sampling import DEFAULT_TOLERANCE
+from ephemeris import ChebyshevEphemeris
+from instrumentation import PROFILER
 
 def get_user_input3d():
     predefined_planets = {
@@ -157,29 +163,16 @@ def simulate_orbits(system, show_trails=True, days=365, steps_per_day=24, sub_st
     ax.yaxis.label.set_color('white')
     ax.title.set_color('white')
     
-    positions_x = []
-    positions_y = []
-    
-    for planet in system.planets:
-        positions_x.append(planet.position[0])
-        positions_y.append(planet.position[1])
-    
     temp_system = System(host=system.host, planets=[Planet(p.name, p.mass, p.position.copy(), p.velocity.copy(), p.color) for p in system.planets])
     
     total_steps = days * steps_per_day
-    sample_rate = max(1, total_steps // 100)
     
-    for step in range(0, total_steps, sample_rate):
-        for _ in range(sample_rate):
-            temp_system.step_forward(dt)
-        
-        for planet in temp_system.planets:
-            positions_x.append(planet.position[0])
-            positions_y.append(planet.position[1])
-    
-    max_abs_x = max(abs(x) for x in positions_x)
-    max_abs_y = max(abs(y) for y in positions_y)
-    max_position = max(max_abs_x, max_abs_y)
+    # only the extent matters here, so keep a running maximum instead of recording positions
+    max_position = max((max(abs(p.position[0]), abs(p.position[1])) for p in temp_system.planets), default=0)
+    for step in range(total_steps):
+        temp_system.step_forward(dt)
+        for p in temp_system.planets:
+            max_position = max(max_position, abs(p.position[0]), abs(p.position[1]))
     
     limit = max_position * 1.1
     
@@ -228,14 +221,19 @@ def simulate_orbits(system, show_trails=True, days=365, steps_per_day=24, sub_st
         return (lines + points) if show_trails else points
     
     def update(frame):
-        # Perform multiple smaller steps for accuracy within one visual update interval
-        for _ in range(steps_per_frame * sub_steps):
-            system.step_forward(dt_calc)
-        
-        host_point.set_data([system.host.position[0]], [system.host.position[1]])
+        profiling = PROFILER.enabled
+        if profiling:
+            frame_start = start = perf_counter()
+
+        # Perform multiple smaller steps for accuracy within one visual update interval;
+        # block steps keep the fastest planet at dt_calc while slower ones take longer steps
+        system.step_forward_block(steps_per_frame * dt, dt_calc)
+        if profiling:
+            start = PROFILER.lap("update2d.integrate", start)
         
-        for i, planet in enumerate(system.planets):
-            if show_trails:
+        if show_trails:
+            trail_data = []
+            for i, planet in enumerate(system.planets):
                 orbit_trails[i].append((planet.position[0], planet.position[1]))
                 
                 if len(orbit_trails[i]) > 2000:
@@ -243,9 +241,20 @@ def simulate_orbits(system, show_trails=True, days=365, steps_per_day=24, sub_st
                 
                 x_trail = [p[0] for p in orbit_trails[i]]
                 y_trail = [p[1] for p in orbit_trails[i]]
-                lines[i].set_data(x_trail, y_trail)
+                trail_data.append((x_trail, y_trail))
+            if profiling:
+                start = PROFILER.lap("update2d.trails", start)
+        
+        host_point.set_data([system.host.position[0]], [system.host.position[1]])
+        
+        for i, planet in enumerate(system.planets):
+            if show_trails:
+                lines[i].set_data(*trail_data[i])
             
             points[i+1].set_data([planet.position[0]], [planet.position[1]])
+        if profiling:
+            PROFILER.lap("update2d.artists", start)
+            PROFILER.record_frame("update2d.frame", perf_counter() - frame_start)
         
         return (lines + points) if show_trails else points
     
@@ -262,6 +271,11 @@ def simulate_orbits(system, show_trails=True, days=365, steps_per_day=24, sub_st
     return fig, anim
 
 def main():
+    # a scenario file skips the prompts (and the simulation too, when cached)
+    if len(sys.argv) > 1:
+        show_scenario3d(Scenario.from_file(sys.argv[1]))
+        return
+
     while True:
         mode = input("Enter the mode you want to run the simulation in (2d/3d): ")
         if mode in ["2d", "3d"]:
@@ -310,33 +324,35 @@ def main():
         system_sim = System(host=sun, planets=sim_planets)
 
         days,steps_per_day,sub_steps = 250,96,10
-        dt = 86400/steps_per_day; dt_calc = dt/sub_steps; frames = days*steps_per_day
-        
-        sample_rate = steps_per_day // 4
+        dt = 86400/steps_per_day; frames = days*steps_per_day
         
         print(f"Running {days} day simulation...")
-        
-        for _ in range(frames):
-            for __ in range(sub_steps): system_sim.step_forward(dt_calc)
-            
-            if _ % sample_rate == 0:
-                for i,p in enumerate(sim_planets):
-                    planet3d_list[i].xPositions.append(p.position[0])
-                    planet3d_list[i].yPositions.append(p.position[1])
-                    planet3d_list[i].zPositions.append(0)
-                
-                # Print progress update
-                if _ % (frames // 10) < sample_rate:
-                    print(f"Simulation {_ / frames * 100:.1f}% complete")
-        
-        print("Simulation complete. Preparing visualization...")
-        
-        # Disable orbit paths as requested
-        system3d = System3d(planets=planet3d_list, show_orbit_paths=False)
-        # Use a very slow speed factor (0.1 = 10x slower) so animation is easily visible
-        print("Starting smooth animation...")
-        # Use a moderate speed factor with the new smooth interpolation
-        system3d.animateSimulation(speed_factor=0.5)
+        scenario = Scenario.from_system(system_sim, dt, sub_steps, frames, tolerance=DEFAULT_TOLERANCE, integrator="block-verlet")
+        show_scenario3d(scenario, planet3d_list)
+
+def show_scenario3d(scenario, planet3d_list=None):
+    # identical scenarios are loaded from the result cache instead of re-integrated
+    trajectory = load_or_run(scenario)
+
+    if planet3d_list is None:
+        planet3d_list = [
+            Planet3d(b["name"], [b["position"][0]], [b["position"][1]], [0], b.get("color", "blue"), b.get("radius", 1))
+            for b in scenario.bodies
+        ]
+
+    samples = [body_samples(trajectory, i) for i in range(len(planet3d_list))]
+    for p3d, (times, positions) in zip(planet3d_list, samples):
+        p3d.set_samples(times.tolist(), positions[:, 0].tolist(), positions[:, 1].tolist(), [0] * len(times))
+    
+    print("Simulation complete. Preparing visualization...")
+    ephemeris = ChebyshevEphemeris.fit(samples)
+    
+    # Disable orbit paths as requested
+    system3d = System3d(planets=planet3d_list, show_orbit_paths=False, ephemeris=ephemeris)
+    # Use a very slow speed factor (0.1 = 10x slower) so animation is easily visible
+    print("Starting smooth animation...")
+    # Use a moderate speed factor with the new smooth interpolation
+    system3d.animateSimulation(speed_factor=0.5)
 
 if __name__ == '__main__':
     main() 
@@ -6,6 +6,9 @@ from typing import Optional
 import numpy as np
 import pyvista as pv
 
+from ephemeris import ChebyshevEphemeris
+from instrumentation import PROFILER
+
 SCALE = 1e10
 PLANET_RADIUS_SCALE = 2000
 DISTANCE_SCALE = 1.2
@@ -16,6 +19,7 @@ EARTH_RENDER_RADIUS = 1.0
 MIN_RADIUS = 0.2
 ZOOM_FACTOR = 1.2
 PAN_STEP = 0.1
+PLAYBACK_KEY_FRAMES = 1_000
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 TEXTURE_DIR = SCRIPT_DIR / "textures"
@@ -30,9 +34,12 @@ class Planet3d:
         zPositions: list[float],
         color: str = "blue",
         radius: float = 1,
+        times: Optional[list[float]] = None,
     ):
         self.name = name
         self.xPositions, self.yPositions, self.zPositions = xPositions, yPositions, zPositions
+        # sample times; without them samples are assumed to be evenly spaced
+        self.times = times
         self.color = color
         self.radius = radius
 
@@ -70,6 +77,15 @@ class Planet3d:
         print(f"No texture found for {self.name}")
         return None
 
+    def set_samples(self, times: list[float], xPositions: list[float], yPositions: list[float], zPositions: list[float]):
+        self.times = times
+        self.xPositions, self.yPositions, self.zPositions = xPositions, yPositions, zPositions
+
+    def sample_times(self) -> np.ndarray:
+        if self.times is None:
+            return np.arange(len(self.xPositions), dtype=float)
+        return np.asarray(self.times, dtype=float)
+
     def get_position(self):
         return [self.xPosition, self.yPosition, self.zPosition]
 
@@ -83,8 +99,15 @@ class Planet3d:
 
 
 class System3d:
-    def __init__(self, planets: list[Planet3d], show_orbit_paths: bool = True):
+    def __init__(
+        self,
+        planets: list[Planet3d],
+        show_orbit_paths: bool = True,
+        ephemeris: Optional[ChebyshevEphemeris] = None,
+    ):
         self.planets = planets
+        # smooth positions between samples when available, otherwise linear interpolation
+        self.ephemeris = ephemeris
         self.plotter = pv.Plotter()
         self.plotter.set_background("black")
         self._load_background()
@@ -195,38 +218,57 @@ class System3d:
         )
         self.plotter.camera.zoom(1.2)
 
-    def _interp_position(self, idx: int, i1: int, i2: int, t: float):
-        p = self.planets[idx]
-        x = p.xPositions[i1] + (p.xPositions[i2] - p.xPositions[i1]) * t
-        y = p.yPositions[i1] + (p.yPositions[i2] - p.yPositions[i1]) * t
-        z = p.zPositions[i1] + (p.zPositions[i2] - p.zPositions[i1]) * t
-        p.set_position(x, y, z)
+    def _interp_position(self, idx: int, t: float):
+        if self.ephemeris is not None:
+            pos = self.ephemeris.position(idx, t)
+            self.planets[idx].set_position(pos[0], pos[1], pos[2] if len(pos) > 2 else 0.0)
+            return
+        times, xs, ys, zs = self._samples[idx]
+        self.planets[idx].set_position(np.interp(t, times, xs), np.interp(t, times, ys), np.interp(t, times, zs))
 
-    def animateSimulation(self, speed_factor: float = 1.0):
+    def animateSimulation(self, speed_factor: float = 1.0, key_frames: int = PLAYBACK_KEY_FRAMES):
         self.plotter.show(full_screen=True, interactive_update=True, auto_close=False)
 
-        total = len(self.planets[0].xPositions)
-        frame_skip = max(1, total // 1_000)
+        # bodies may be sampled at different times, so playback walks a shared, even clock
+        self._samples = [
+            (p.sample_times(), np.asarray(p.xPositions), np.asarray(p.yPositions), np.asarray(p.zPositions))
+            for p in self.planets
+        ]
+        if self.ephemeris is not None:
+            start_time, end_time = self.ephemeris.start, self.ephemeris.end
+        else:
+            start_time = max(samples[0][0] for samples in self._samples)
+            end_time = min(samples[0][-1] for samples in self._samples)
+        frame_dt = (end_time - start_time) / key_frames
         interp_frames, delay = 5, 0.02 / speed_factor
 
         i = 0
-        while i < total - frame_skip and self.running:
+        while i < key_frames and self.running:
             self.plotter.update(stime=1, force_redraw=False)
 
             if self.paused:
                 time.sleep(delay)
                 continue
 
-            nxt = min(i + frame_skip, total - 1)
             for step in range(interp_frames + 1):
-                t = step / interp_frames
+                profiling = PROFILER.enabled
+                if profiling:
+                    frame_start = start = time.perf_counter()
+
+                t = start_time + (i + step / interp_frames) * frame_dt
                 for idx in range(len(self.planets)):
-                    self._interp_position(idx, i, nxt, t)
+                    self._interp_position(idx, t)
+                if profiling:
+                    start = PROFILER.lap("animate3d.interp", start)
+
                 self.plotter.render()
                 self.plotter.update(stime=1, force_redraw=False)
+                if profiling:
+                    PROFILER.lap("animate3d.render", start)
+                    PROFILER.record_frame("animate3d.frame", time.perf_counter() - frame_start)
                 time.sleep(delay)
 
-            i += frame_skip
+            i += 1
 
         self.plotter.close()
 
@@ -0,0 +1,106 @@
+from typing import Optional
+
+import numpy as np
+
+# default spatial tolerance in metres, far below what either renderer can show
+DEFAULT_TOLERANCE = 1e7
+CHECK_SAMPLES = 512
+
+
+class AdaptiveRecorder:
+    """Records trajectories, keeping a sample only when it is needed to stay within tolerance.
+
+    Every body keeps an anchor (its last kept sample) and the samples seen since. When linear
+    interpolation in time from the anchor to the newest position would miss any of those samples
+    by more than tolerance, the previous sample is kept and becomes the new anchor. Fast,
+    curved stretches therefore keep many samples and slow, straight ones very few, however
+    long the run. To bound the per-sample work and memory, at most check_samples of the samples
+    since the anchor are held for the check: when the buffer fills, every other one is dropped
+    and only every second later sample is buffered, so the checked samples stay evenly spread
+    over the whole gap.
+    """
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE, check_samples: int = CHECK_SAMPLES):
+        self.tolerance = tolerance
+        # must be even so halving the buffer keeps it evenly spaced
+        self.check_samples = check_samples + check_samples % 2
+        self.kept_times: Optional[list[list[float]]] = None
+        self.kept_positions: Optional[list[list[np.ndarray]]] = None
+
+    def _start(self, t: float, pos: np.ndarray):
+        n, dims = pos.shape
+        self.kept_times = [[t] for _ in range(n)]
+        self.kept_positions = [[pos[i].copy()] for i in range(n)]
+        self._anchor_t = np.full(n, t)
+        self._anchor_pos = pos.copy()
+        self._last_t = np.full(n, t)
+        self._last_pos = pos.copy()
+        self._pending_t = np.zeros((n, self.check_samples))
+        self._pending_pos = np.zeros((n, self.check_samples, dims))
+        self._count = np.zeros(n, dtype=int)
+        # samples seen since the anchor, and the spacing of the buffered ones among them
+        self._seen = np.zeros(n, dtype=int)
+        self._stride = np.ones(n, dtype=int)
+
+    def record(self, t: float, positions):
+        """Offer the positions of every body, shape (bodies, dims), at time t."""
+        pos = np.array(positions, dtype=float)
+        if self.kept_times is None:
+            self._start(t, pos)
+            return
+
+        waiting = self._seen > 0
+        if waiting.any():
+            span = t - self._anchor_t
+            chord = pos - self._anchor_pos
+            width = self._count.max()
+            frac = (self._pending_t[:, :width] - self._anchor_t[:, None]) / span[:, None]
+            miss = self._pending_pos[:, :width] - self._anchor_pos[:, None, :] - frac[:, :, None] * chord[:, None, :]
+            # squared distances against the squared tolerance, skipping unused buffer slots
+            too_far = np.einsum('ijk,ijk->ij', miss, miss) > self.tolerance**2
+            too_far &= np.arange(width)[None, :] < self._count[:, None]
+
+            # the previous sample is checked too, since it may fall between buffered ones
+            frac_last = (self._last_t - self._anchor_t) / span
+            miss_last = self._last_pos - self._anchor_pos - frac_last[:, None] * chord
+            exceeded = waiting & (too_far.any(axis=1) | (np.einsum('ij,ij->i', miss_last, miss_last) > self.tolerance**2))
+
+            for i in np.flatnonzero(exceeded):
+                self._keep(i, self._last_t[i], self._last_pos[i])
+
+        self._seen += 1
+        for i in np.flatnonzero((self._seen % self._stride == 0) & (self._count == self.check_samples)):
+            self._thin(i)
+        idx = np.flatnonzero(self._seen % self._stride == 0)
+        self._pending_t[idx, self._count[idx]] = t
+        self._pending_pos[idx, self._count[idx]] = pos[idx]
+        self._count[idx] += 1
+        self._last_t[:] = t
+        self._last_pos[:] = pos
+
+    def _thin(self, i: int):
+        # buffered samples sit at seen = stride, 2 stride, ...; keep those at multiples of 2 stride
+        half = self.check_samples // 2
+        self._pending_t[i, :half] = self._pending_t[i, 1::2]
+        self._pending_pos[i, :half] = self._pending_pos[i, 1::2]
+        self._count[i] = half
+        self._stride[i] *= 2
+
+    def _keep(self, i: int, t: float, pos: np.ndarray):
+        self.kept_times[i].append(float(t))
+        self.kept_positions[i].append(pos.copy())
+        self._anchor_t[i] = t
+        self._anchor_pos[i] = pos
+        self._count[i] = 0
+        self._seen[i] = 0
+        self._stride[i] = 1
+
+    def finish(self):
+        """Keep the final sample of every body so the recording ends where the run did."""
+        if self.kept_times is None:
+            return
+        for i in np.flatnonzero(self._seen):
+            self._keep(i, self._last_t[i], self._last_pos[i])
+
+    def samples(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        return np.array(self.kept_times[i]), np.array(self.kept_positions[i])
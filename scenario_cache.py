@@ -0,0 +1,270 @@
+import hashlib
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from models import Planet, System
+from sampling import AdaptiveRecorder
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+CACHE_DIR = SCRIPT_DIR / ".orbit_cache"
+MAX_CACHE_BYTES = 512 * 1024**2
+
+# bump this whenever the integrator or recorder changes so old trajectories are not reused
+CACHE_VERSION = 4
+# block-verlet steps each body every power-of-two number of sub-steps (System.step_forward_block)
+INTEGRATORS = ("velocity-verlet", "block-verlet")
+
+
+class Scenario:
+    """Non-interactive description of a run: bodies, initial states, integrator and timing."""
+
+    def __init__(
+        self,
+        host: dict,
+        bodies: list[dict],
+        dt: float,
+        sub_steps: int,
+        steps: int,
+        sample_every: int = 1,
+        integrator: str = "velocity-verlet",
+        tolerance: Optional[float] = None,
+        compensated: bool = False,
+    ):
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"unknown integrator '{integrator}'")
+        self.host = host
+        self.bodies = bodies
+        self.dt = float(dt)
+        self.sub_steps = int(sub_steps)
+        self.steps = int(steps)
+        self.sample_every = max(1, int(sample_every))
+        self.integrator = integrator
+        # when set, samples are kept adaptively to this spatial error instead of every sample_every steps
+        self.tolerance = tolerance
+        self.compensated = compensated
+
+    @classmethod
+    def from_system(
+        cls,
+        system: System,
+        dt: float,
+        sub_steps: int,
+        steps: int,
+        sample_every: int = 1,
+        tolerance: Optional[float] = None,
+        integrator: str = "velocity-verlet",
+    ):
+        return cls(
+            host=_body_dict(system.host),
+            bodies=[_body_dict(p) for p in system.planets],
+            dt=dt,
+            sub_steps=sub_steps,
+            steps=steps,
+            sample_every=sample_every,
+            tolerance=tolerance,
+            integrator=integrator,
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            host=data["host"],
+            bodies=data["bodies"],
+            dt=data["dt"],
+            sub_steps=data.get("sub_steps", 1),
+            steps=data["steps"],
+            sample_every=data.get("sample_every", 1),
+            integrator=data.get("integrator", "velocity-verlet"),
+            tolerance=data.get("tolerance"),
+            compensated=data.get("compensated", False),
+        )
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self) -> dict:
+        return {
+            "host": self.host,
+            "bodies": self.bodies,
+            "dt": self.dt,
+            "sub_steps": self.sub_steps,
+            "steps": self.steps,
+            "sample_every": self.sample_every,
+            "integrator": self.integrator,
+            "tolerance": self.tolerance,
+            "compensated": self.compensated,
+        }
+
+    def key(self) -> str:
+        """Hash of everything that affects the trajectory (colors are display-only)."""
+        physics = self.to_dict()
+        physics["host"] = _strip_display(self.host)
+        physics["bodies"] = [_strip_display(b) for b in self.bodies]
+        physics["version"] = CACHE_VERSION
+        blob = json.dumps(physics, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def build_system(self) -> System:
+        host = _planet_from_dict(self.host)
+        return System(host=host, planets=[_planet_from_dict(b) for b in self.bodies], compensated=self.compensated)
+
+
+def _body_dict(planet: Planet) -> dict:
+    return {
+        "name": planet.name,
+        "mass": planet.mass,
+        "position": [float(x) for x in planet.position],
+        "velocity": [float(v) for v in planet.velocity],
+        "color": planet.color,
+    }
+
+
+def _strip_display(body: dict) -> dict:
+    return {k: v for k, v in body.items() if k != "color"}
+
+
+def _planet_from_dict(body: dict) -> Planet:
+    return Planet(
+        body["name"],
+        body["mass"],
+        list(body["position"]),
+        list(body["velocity"]),
+        body.get("color", "blue"),
+    )
+
+
+def run_scenario(scenario: Scenario) -> dict:
+    """Integrate a scenario and return its samples.
+
+    Fixed-stride runs give times of shape (samples,) and positions of shape (samples, bodies, dims).
+    Adaptive runs keep a different number of samples per body, so times and positions are
+    concatenated across bodies with per-body counts; use body_samples to read either layout.
+    """
+    system = scenario.build_system()
+    dt_calc = scenario.dt / scenario.sub_steps
+    recorder = AdaptiveRecorder(scenario.tolerance) if scenario.tolerance else None
+
+    times = [0.0]
+    positions = [[list(p.position) for p in system.planets]]
+    if recorder:
+        recorder.record(0.0, positions[0])
+    progress_every = max(1, scenario.steps // 10)
+    for step in range(scenario.steps):
+        if scenario.integrator == "block-verlet":
+            system.step_forward_block(scenario.dt, dt_calc)
+        else:
+            for _ in range(scenario.sub_steps):
+                system.step_forward(dt_calc)
+        if recorder:
+            recorder.record((step + 1) * scenario.dt, [p.position for p in system.planets])
+        elif step % scenario.sample_every == 0:
+            times.append((step + 1) * scenario.dt)
+            positions.append([list(p.position) for p in system.planets])
+        if step % progress_every == 0:
+            print(f"Simulation {step / scenario.steps * 100:.1f}% complete")
+
+    if recorder:
+        recorder.finish()
+        samples = [recorder.samples(i) for i in range(len(system.planets))]
+        return {
+            "times": np.concatenate([t for t, _ in samples]),
+            "positions": np.concatenate([p for _, p in samples]),
+            "counts": np.array([len(t) for t, _ in samples]),
+        }
+
+    return {
+        "times": np.array(times),
+        "positions": np.array(positions, dtype=float).reshape(len(times), len(system.planets), -1),
+    }
+
+
+def body_samples(result: dict, i: int) -> tuple[np.ndarray, np.ndarray]:
+    """Sample times and positions of body i from either trajectory layout."""
+    if "counts" not in result:
+        return result["times"], result["positions"][:, i]
+    start = int(np.sum(result["counts"][:i]))
+    end = start + int(result["counts"][i])
+    return result["times"][start:end], result["positions"][start:end]
+
+
+class ResultCache:
+    """On-disk store of finished trajectories, evicting least recently used entries past max_bytes."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            # missing, truncated or otherwise unreadable entries count as a miss
+            return None
+        # touching the file marks it as recently used for eviction; if another process evicted
+        # it since it was read, the loaded result is still good
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # the temporary name must not match *.npz, or evict/clear could remove another writer's file
+        tmp_path = path.with_name(f"{key}.npz.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **result)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep: Optional[Path] = None):
+        entries = []
+        for path in self.directory.glob("*.npz"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for path in self.directory.glob("*.npz"):
+            path.unlink()
+
+
+def load_or_run(scenario: Scenario, cache: Optional[ResultCache] = None) -> dict:
+    """Return the cached trajectory for this scenario, simulating and storing it on a miss."""
+    cache = cache if cache is not None else ResultCache()
+    key = scenario.key()
+    result = cache.get(key)
+    if result is not None:
+        print(f"Loaded cached simulation {key[:12]}")
+        return result
+
+    result = run_scenario(scenario)
+    cache.put(key, result)
+    return result
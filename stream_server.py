@@ -0,0 +1,391 @@
+"""Share one running simulation with any number of local viewers.
+
+A SimulationServer steps a single System and broadcasts compact binary frames over
+localhost TCP (address=(host, port)) or a Unix socket (address="/path/to/socket").
+Positions are quantized to integer multiples of `quantum` metres. Frames are sent as int16
+residuals against a prediction extrapolated from the last (up to three) consecutive frames
+that subscriber received, and as key frames when a residual does not fit: int32, or int64
+for anything beyond +-2**31 quanta. Orbits are smooth, so the quadratic prediction stays
+within int16 even at a simulated day per frame.
+Every subscriber has its own small queue and sender thread, so a slow viewer drops frames
+instead of holding up the simulation; a dropped frame restarts the prediction.
+
+    python stream_server.py            # serve the nine-planet preset
+    python stream_server.py --view     # open a 2D viewer on the running server
+"""
+import json
+import math
+import os
+import queue
+from collections import deque
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from models import Planet, System
+
+DEFAULT_ADDRESS = ("127.0.0.1", 8765)
+# 4 km steps cover +-8.8e12 m in int32 key frames, well past Pluto; anything farther is sent as int64
+DEFAULT_QUANTUM = 4096.0
+KEYFRAME_INTERVAL = 64
+QUEUE_SIZE = 2
+# small kernel buffers keep a stalled viewer from hiding a long backlog in the socket
+SEND_BUFFER = 8192
+
+MAGIC = b"ORBF"
+KIND_KEY, KIND_DELTA, KIND_META, KIND_KEY64 = 0, 1, 2, 3
+# magic, kind, frame index, sim time, body count, dims, quantum
+HEADER = struct.Struct("<4sBIdHBd")
+LENGTH = struct.Struct("<I")
+
+
+def _socket_for(address):
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    return socket.socket(family, socket.SOCK_STREAM)
+
+
+def _predict(history: deque) -> np.ndarray:
+    """Extrapolate the next quantized frame from up to three consecutive earlier ones.
+
+    Both ends run this on identical integer frames, so the prediction matches exactly.
+    """
+    if len(history) >= 3:
+        return 3 * history[-1] - 3 * history[-2] + history[-3]
+    if len(history) == 2:
+        return 2 * history[-1] - history[-2]
+    return history[-1]
+
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+class _Subscriber:
+    def __init__(self, server, conn: socket.socket):
+        self.server = server
+        self.conn = conn
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        # frames this subscriber was sent, reset whenever one is skipped
+        self.history: deque = deque(maxlen=3)
+        self.last_index: Optional[int] = None
+        self.since_key = 0
+        self.dropped = 0
+        self.alive = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def offer(self, frame):
+        """Never blocks: when the queue is full the oldest waiting frame is discarded."""
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(frame)
+            except queue.Full:
+                self.dropped += 1
+
+    def _encode(self, index: int, t: float, quantized: np.ndarray) -> bytes:
+        n, dims = quantized.shape
+        quantum = self.server.quantum
+        if self.last_index is not None and index != self.last_index + 1:
+            self.history.clear()
+        self.last_index = index
+        if self.history and self.since_key < KEYFRAME_INTERVAL:
+            residual = quantized - _predict(self.history)
+            if np.all(np.abs(residual) < 2**15):
+                self.since_key += 1
+                self.history.append(quantized)
+                header = HEADER.pack(MAGIC, KIND_DELTA, index, t, n, dims, quantum)
+                return header + residual.astype("<i2").tobytes()
+        self.since_key = 0
+        self.history.append(quantized)
+        # int32 would silently wrap beyond +-2**31 quanta and desync both prediction histories
+        if np.abs(quantized).max(initial=0) >= 2**31:
+            header = HEADER.pack(MAGIC, KIND_KEY64, index, t, n, dims, quantum)
+            return header + quantized.astype("<i8").tobytes()
+        header = HEADER.pack(MAGIC, KIND_KEY, index, t, n, dims, quantum)
+        return header + quantized.astype("<i4").tobytes()
+
+    def send(self, payload: bytes):
+        self.conn.sendall(LENGTH.pack(len(payload)) + payload)
+
+    def _run(self):
+        try:
+            self.send(self.server.metadata())
+            while self.alive:
+                frame = self.queue.get()
+                if frame is None:
+                    break
+                index, t, quantized = frame
+                self.send(self._encode(index, t, quantized))
+        except OSError:
+            pass
+        finally:
+            self.alive = False
+            self.conn.close()
+            self.server._remove(self)
+
+
+class SimulationServer:
+    def __init__(self, system: System, address=DEFAULT_ADDRESS, quantum: float = DEFAULT_QUANTUM):
+        self.system = system
+        self.address = address
+        self.quantum = quantum
+        self.frame_index = 0
+        self.sim_time = 0.0
+        self.subscribers: list[_Subscriber] = []
+        self._lock = threading.Lock()
+        self._listener: Optional[socket.socket] = None
+        self.running = False
+
+    def metadata(self) -> bytes:
+        bodies = [self.system.host] + list(self.system.planets)
+        info = {
+            "names": [b.name for b in bodies],
+            "colors": [b.color for b in bodies],
+            "masses": [b.mass for b in bodies],
+        }
+        header = HEADER.pack(MAGIC, KIND_META, 0, 0.0, len(bodies), 0, self.quantum)
+        return header + json.dumps(info).encode()
+
+    def start(self):
+        self._listener = _socket_for(self.address)
+        if isinstance(self.address, str):
+            # a socket file left behind by a previous server would make bind fail
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+        else:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(self.address)
+        self._listener.listen()
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+            if conn.family == socket.AF_INET:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sub = _Subscriber(self, conn)
+            with self._lock:
+                self.subscribers.append(sub)
+            sub.thread.start()
+
+    def _remove(self, sub: _Subscriber):
+        with self._lock:
+            if sub in self.subscribers:
+                self.subscribers.remove(sub)
+
+    def publish(self):
+        """Quantize the current state once and hand it to every subscriber."""
+        bodies = [self.system.host] + list(self.system.planets)
+        positions = np.array([b.position for b in bodies], dtype=float)
+        quantized = np.rint(positions / self.quantum).astype(np.int64)
+        frame = (self.frame_index, self.sim_time, quantized)
+        with self._lock:
+            subscribers = list(self.subscribers)
+        for sub in subscribers:
+            sub.offer(frame)
+        self.frame_index += 1
+
+    def serve(self, dt: float, steps_per_frame: int = 1, frame_interval: float = 0.02, max_frames: Optional[int] = None):
+        """Step the system and broadcast a frame every steps_per_frame steps, paced to frame_interval seconds."""
+        if not self.running:
+            self.start()
+        next_frame = time.perf_counter()
+        try:
+            while self.running and (max_frames is None or self.frame_index < max_frames):
+                for _ in range(steps_per_frame):
+                    self.system.step_forward(dt)
+                self.sim_time += dt * steps_per_frame
+                self.publish()
+
+                next_frame += frame_interval
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame = time.perf_counter()
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.unlink(self.address)
+        with self._lock:
+            subscribers = list(self.subscribers)
+        # the sentinel goes behind any queued frames, so subscribers still get the final state
+        for sub in subscribers:
+            sub.offer(None)
+
+
+class StreamSubscriber:
+    """Client side: decodes frames from a SimulationServer into float64 positions, shape (bodies, dims)."""
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.sock = _socket_for(address)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SEND_BUFFER)
+        self.sock.connect(address)
+        kind, _, _, _, payload = self._read()
+        if kind != KIND_META:
+            raise ValueError("stream did not start with metadata")
+        self.metadata = json.loads(payload)
+        self._history: deque = deque(maxlen=3)
+        self._last_index: Optional[int] = None
+
+    def _read(self):
+        raw = _recv_exact(self.sock, LENGTH.size)
+        if raw is None:
+            return None
+        message = _recv_exact(self.sock, LENGTH.unpack(raw)[0])
+        if message is None:
+            return None
+        magic, kind, index, t, n, dims, quantum = HEADER.unpack_from(message)
+        if magic != MAGIC:
+            raise ValueError("not an orbit stream")
+        return kind, index, t, (n, dims, quantum), message[HEADER.size:]
+
+    def read_frame(self):
+        """Next (frame index, sim time, positions), or None once the server goes away."""
+        message = self._read()
+        if message is None:
+            return None
+        kind, index, t, (n, dims, quantum), payload = message
+        if kind not in (KIND_KEY, KIND_KEY64, KIND_DELTA):
+            return self.read_frame()
+        # mirror the server: a skipped frame index restarts the prediction
+        if self._last_index is not None and index != self._last_index + 1:
+            self._history.clear()
+        self._last_index = index
+        if kind == KIND_KEY:
+            quantized = np.frombuffer(payload, dtype="<i4").reshape(n, dims).astype(np.int64)
+        elif kind == KIND_KEY64:
+            quantized = np.frombuffer(payload, dtype="<i8").reshape(n, dims).copy()
+        else:
+            quantized = _predict(self._history) + np.frombuffer(payload, dtype="<i2").reshape(n, dims)
+        self._history.append(quantized)
+        return index, t, quantized * quantum
+
+    def __iter__(self):
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def close(self):
+        self.sock.close()
+
+
+class RemoteSystem:
+    """Stands in for a System inside a viewer: step_forward just picks up the newest streamed frame.
+
+    A reader thread keeps only the latest frame, so viewers such as simulate_orbits can call
+    step_forward as often as they like without integrating anything themselves.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.subscriber = StreamSubscriber(address)
+        meta = self.subscriber.metadata
+        first = self.subscriber.read_frame()
+        second = self.subscriber.read_frame()
+        if first is None or second is None:
+            raise ConnectionError("server closed before sending two frames")
+
+        # frames carry positions only; viewers that integrate ahead get velocities from the first two
+        _, t0, p0 = first
+        _, self.sim_time, positions = second
+        velocities = (positions - p0) / (self.sim_time - t0) if self.sim_time > t0 else np.zeros_like(positions)
+        bodies = [
+            Planet(name, mass, list(pos), list(vel), color)
+            for name, mass, color, pos, vel in zip(
+                meta["names"], meta["masses"], meta["colors"], positions.tolist(), velocities.tolist()
+            )
+        ]
+        self.host, self.planets = bodies[0], bodies[1:]
+        self._latest = None
+        self._new = threading.Event()
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    def _read_loop(self):
+        for frame in self.subscriber:
+            self._latest = frame
+            self._new.set()
+
+    def step_forward_block(self, dt: float, min_dt: float):
+        self.step_forward(dt)
+
+    def step_forward(self, dt: float):
+        if not self._new.is_set():
+            return
+        self._new.clear()
+        _, self.sim_time, positions = self._latest
+        for body, pos in zip([self.host] + self.planets, positions):
+            body.position[:] = pos.tolist()
+
+
+# name: (distance, mass, color), as in the orbitPlotter presets
+PRESET = {
+    "Mercury": (5.7e10, 3.3011e23, "silver"),
+    "Venus": (1.075e11, 4.8675e24, "yellow"),
+    "Earth": (1.471e11, 5.972e24, "deepskyblue"),
+    "Mars": (2.066e11, 6.4171e23, "orangered"),
+    "Jupiter": (7.4052e11, 1.8982e27, "orange"),
+    "Saturn": (1.3526e12, 5.6834e26, "gold"),
+    "Uranus": (2.7413e12, 8.6810e25, "cyan"),
+    "Neptune": (4.4445e12, 1.02413e26, "dodgerblue"),
+    "Pluto": (4.4368e12, 1.303e22, "sandybrown"),
+}
+
+
+def preset_system() -> System:
+    """The nine-planet preset on circular orbits."""
+    G = 6.67430e-11
+    sun = Planet("Sun", 1.989e30, [0, 0], [0, 0], "yellow")
+    planets = [
+        Planet(name, mass, [r, 0.0], [0.0, math.sqrt(G * sun.mass / r)], color)
+        for name, (r, mass, color) in PRESET.items()
+    ]
+    return System(host=sun, planets=planets)
+
+
+def main():
+    if "--view" in sys.argv:
+        import matplotlib.pyplot as plt
+        from orbitPlotter import simulate_orbits
+
+        remote = RemoteSystem()
+        fig, anim = simulate_orbits(remote, show_trails=True)
+        plt.show(block=True)
+        return
+
+    server = SimulationServer(preset_system())
+    print(f"Serving simulation on {server.address}")
+    server.serve(dt=86400 / 96, steps_per_frame=96)
+
+
+if __name__ == "__main__":
+    main()
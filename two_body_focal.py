@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import numpy as np
 import math
+import sys
 
 # constants
 G = 6.67430e-11
@@ -17,113 +18,213 @@ a = rp / (1 - e) # semi-major axis
 # this calculates the speed at which the comet travels when it is closest to the sun
 vp_mag = np.sqrt(G * sun_mass * (1 + e) / rp)
 
-sun = Planet(name="Sun", mass=sun_mass, position=[-2e10, 0], velocity=[0, 0], color='yellow')
-# place planet at perihelion on the positive x-axis relative to sun offset
-planet_initial_pos = [sun.position[0] + rp, 0]
-planet = Planet(name="Comet (e=0.7)", mass=planet_mass, position=planet_initial_pos, velocity=[0, vp_mag], color='cyan')
-solar_system = System(host=sun, planets=[planet])
-
 dt = 3600 # time step (1 hour)
-fig, ax = plt.subplots(figsize=(10, 10))
-
-fig.patch.set_facecolor('black')
-ax.set_facecolor('black')
-ax.grid(True, color='gray', alpha=0.3)
-ax.tick_params(colors='white')
-ax.xaxis.label.set_color('white')
-ax.yaxis.label.set_color('white')
-ax.title.set_color('white')
-
-#calculate the fixed second focus position
-sun_pos_initial = np.array(sun.position)  #convert sun position to array
-planet_pos_initial = np.array(planet.position)  #convert planet position to array
-vec_sun_planet_initial = planet_pos_initial - sun_pos_initial  #vector from sun to planet
-rp_check = np.linalg.norm(vec_sun_planet_initial)  #measure perihelion distance (the distance where it is closest to the host)
-a = rp_check / (1 - e)  # calculate semi-major axis
-c = a * e  # distance from center to focus
-focus_direction = vec_sun_planet_initial / rp_check  # unit vector to perihelion
-focus_b_pos = sun_pos_initial - focus_direction * (2 * c)  # locate second focus
-
-planet_trail = []
-
-planet_point, = ax.plot([], [], 'o', color=planet.color, markersize=8, label=planet.name)
-sun_point, = ax.plot([], [], 'o', color=sun.color, markersize=12, label='Sun (Focus A)')
-trail_line, = ax.plot([], [], '-', color=planet.color, alpha=0.3)
-focal_line_1, = ax.plot([], [], '-', color='red', alpha=0.5)  # line between foci
-focal_line_2, = ax.plot([], [], '-', color='green', alpha=0.5) # line focus a to planet
-focal_line_3, = ax.plot([], [], '-', color='blue', alpha=0.5)  # line focus b to planet
-focal_lines_together, = ax.plot([], [], '-', color='purple', alpha=0.5)
-focus_b_point, = ax.plot([], [], 'o', color='white', markersize=4, label='Focus B')
-
-# Text elements for displaying distances
-dist_text_a = ax.text(0.02, 0.95, '', transform=ax.transAxes, verticalalignment='top', fontsize=9, color='green')
-dist_text_b = ax.text(0.02, 0.90, '', transform=ax.transAxes, verticalalignment='top', fontsize=9, color='blue')
-dist_text_c = ax.text(0.02, 0.85, '', transform=ax.transAxes, verticalalignment='top', fontsize=9, color='purple')
-
-def init():
-    #initialize a bunch of values that we can use for the rest of the simulation (lines, trails, text)
-    sun_point.set_data([sun_pos_initial[0]], [sun_pos_initial[1]])
-    focus_b_point.set_data([focus_b_pos[0]], [focus_b_pos[1]])
-    focal_line_1.set_data([sun_pos_initial[0], focus_b_pos[0]], [sun_pos_initial[1], focus_b_pos[1]])
-    planet_point.set_data([], [])
-    trail_line.set_data([], [])
-    focal_line_2.set_data([], [])
-    focal_line_3.set_data([], [])
-
-    dist_text_c.set_text('')
-    dist_text_a.set_text('')
-    dist_text_b.set_text('')
-    focal_lines_together.set_data([], [])
-    return planet_point, sun_point, trail_line, focal_line_1, focal_line_2, focal_line_3, focus_b_point, dist_text_a, dist_text_b, dist_text_c, focal_lines_together
-def update(frame):
-    # increase steps per frame for faster movement, especially near aphelion
-    steps_per_frame = 120 
-    for _ in range(steps_per_frame):
+steps_per_frame = 120 # increase steps per frame for faster movement, especially near aphelion
+frames = 2000
+
+
+def simulate_trajectory(n_steps, dt=dt):
+    """Run the comet for n_steps and return the sun position and every planet position, shape (n_steps + 1, 2)."""
+    sun = Planet(name="Sun", mass=sun_mass, position=[-2e10, 0], velocity=[0, 0], color='yellow')
+    # place planet at perihelion on the positive x-axis relative to sun offset
+    planet_initial_pos = [sun.position[0] + rp, 0]
+    planet = Planet(name="Comet (e=0.7)", mass=planet_mass, position=planet_initial_pos, velocity=[0, vp_mag], color='cyan')
+    solar_system = System(host=sun, planets=[planet])
+
+    positions = np.empty((n_steps + 1, 2))
+    positions[0] = planet.position
+    for step in range(1, n_steps + 1):
         solar_system.step_forward(dt)
-    
-    planet_pos = np.array(planet.position)
-    sun_pos = np.array(sun.position) 
-    
-    planet_trail.append(planet_pos)
-    # note: we could increase trail length, but this is good since we want fast performance for verification
-    if len(planet_trail) > 1000:
-        planet_trail.pop(0)
-    
-    planet_point.set_data([planet_pos[0]], [planet_pos[1]])
-    
-    trail_x = [pos[0] for pos in planet_trail]
-    trail_y = [pos[1] for pos in planet_trail]
-    trail_line.set_data(trail_x, trail_y)
-    
-    focal_line_2.set_data([sun_pos[0], planet_pos[0]], [sun_pos[1], planet_pos[1]])
-    focal_line_3.set_data([focus_b_pos[0], planet_pos[0]], [focus_b_pos[1], planet_pos[1]])
-    # calculate and update distances text
-    dist_a_planet = np.linalg.norm(planet_pos - sun_pos)
-    dist_b_planet = np.linalg.norm(planet_pos - focus_b_pos)
-    dist_text_a.set_text(f'Focus A to Planet: {dist_a_planet:.3e} m')
-    dist_text_b.set_text(f'Focus B to Planet: {dist_b_planet:.3e} m')
-    dist_text_c.set_text(f'Sum (Foci-Planet): {dist_a_planet + dist_b_planet:.3e} m')
-
-    # set axis limits only once
-    if frame == 0:
-        # estimate distance of aphelion
-        ra = a * (1 + e)
-        max_dist = ra * 1.1 
-        center = (sun_pos_initial + focus_b_pos) / 2 # center plot around ellipse's center
-        ax.set_xlim(center[0] - max_dist * 1.1, center[0] + max_dist * 1.1)
-        ax.set_ylim(center[1] - max_dist * 1.1, center[1] + max_dist * 1.1)
-        print("Setting the axis limits... (DEBUG)")
-
-    
-    # only return artists that change
-    return planet_point, trail_line, focal_line_2, focal_line_3, dist_text_a, dist_text_b, dist_text_c, focal_lines_together
-
-ax.set_aspect('equal')
-
-focal_line_2.set_label('Line Focus A-Planet')
-focal_line_3.set_label('Line Focus B-Planet')
-focal_lines_together.set_label('Lines added together')
-legend = ax.legend(loc='upper right')
-plt.setp(legend.get_texts(), color='white')
-anim = animation.FuncAnimation(fig, update, init_func=init, frames=2000, interval=1, blit=True)
-plt.show() 
+        positions[step] = planet.position
+    return np.array(sun.position, dtype=float), positions
+
+
+def second_focus(sun_pos, perihelion_pos, e=e):
+    #calculate the fixed second focus position from the perihelion
+    vec_sun_planet = perihelion_pos - sun_pos  #vector from sun to planet
+    rp_check = np.linalg.norm(vec_sun_planet)  #measure perihelion distance (the distance where it is closest to the host)
+    a = rp_check / (1 - e)  # calculate semi-major axis
+    c = a * e  # distance from center to focus
+    focus_direction = vec_sun_planet / rp_check  # unit vector to perihelion
+    return sun_pos - focus_direction * (2 * c), a  # locate second focus
+
+
+def focal_distances(positions, focus_a, focus_b):
+    """Distances from both foci for every sample at once."""
+    dist_a = np.hypot(positions[:, 0] - focus_a[0], positions[:, 1] - focus_a[1])
+    dist_b = np.hypot(positions[:, 0] - focus_b[0], positions[:, 1] - focus_b[1])
+    return dist_a, dist_b
+
+
+def fit_ellipse(positions, focus_a=None):
+    """Least-squares ellipse through all samples: A x^2 + B xy + C y^2 + D x + E y = 1.
+
+    Returns the semi-axes, eccentricity, center, both foci (focus_2 being the one farther from
+    focus_a when given) and the focus-sum residual |p - f1| + |p - f2| - 2a of every sample, in metres.
+    """
+    # fit in normalised coordinates so the normal equations stay well conditioned
+    offset = positions.mean(axis=0)
+    scale = np.abs(positions - offset).max()
+    x = (positions[:, 0] - offset[0]) / scale
+    y = (positions[:, 1] - offset[1]) / scale
+    design = np.column_stack((x * x, x * y, y * y, x, y))
+    (A, B, C, D, E), *_ = np.linalg.lstsq(design, np.ones_like(x), rcond=None)
+
+    M = np.array([[A, B / 2], [B / 2, C]])
+    center = -0.5 * np.linalg.solve(M, [D, E])
+    k = 1 + center @ M @ center
+    eigvals, eigvecs = np.linalg.eigh(M)
+    if np.any(eigvals <= 0) or k <= 0:
+        raise ValueError("samples do not lie on an ellipse")
+
+    # the smaller eigenvalue belongs to the major axis
+    semi_major = math.sqrt(k / eigvals[0]) * scale
+    semi_minor = math.sqrt(k / eigvals[1]) * scale
+    major_axis = eigvecs[:, 0]
+    ecc = math.sqrt(1 - (semi_minor / semi_major) ** 2)
+    center = center * scale + offset
+
+    foci = [center + major_axis * semi_major * ecc, center - major_axis * semi_major * ecc]
+    if focus_a is not None:
+        foci.sort(key=lambda f: np.linalg.norm(f - focus_a))
+    dist_1, dist_2 = focal_distances(positions, foci[0], foci[1])
+
+    return {
+        "a": semi_major,
+        "b": semi_minor,
+        "e": ecc,
+        "center": center,
+        "focus_1": foci[0],
+        "focus_2": foci[1],
+        "residuals": dist_1 + dist_2 - 2 * semi_major,
+    }
+
+
+def focal_report(positions, sun_pos, focus_b_pos, a):
+    """Vectorised verification of the whole stored trajectory against the expected and fitted ellipse."""
+    dist_a, dist_b = focal_distances(positions, sun_pos, focus_b_pos)
+    deviation = dist_a + dist_b - 2 * a
+    fit = fit_ellipse(positions, focus_a=sun_pos)
+    return {
+        "samples": len(positions),
+        "dist_a": dist_a,
+        "dist_b": dist_b,
+        "focus_sum_deviation": deviation,
+        "max_abs_deviation": np.max(np.abs(deviation)),
+        "rms_deviation": np.sqrt(np.mean(deviation ** 2)),
+        "fit": fit,
+    }
+
+
+def print_report(report, a):
+    fit = report["fit"]
+    print(f"Samples analysed: {report['samples']}")
+    print(f"Expected focus sum (2a): {2 * a:.6e} m")
+    print(f"Max |focus sum - 2a|: {report['max_abs_deviation']:.3e} m ({report['max_abs_deviation'] / (2 * a) * 100:.4f}%)")
+    print(f"RMS focus sum deviation: {report['rms_deviation']:.3e} m")
+    print("Least-squares ellipse fit:")
+    print(f"  a = {fit['a']:.6e} m (expected {a:.6e})")
+    print(f"  e = {fit['e']:.6f} (expected {e})")
+    print(f"  second focus = ({fit['focus_2'][0]:.4e}, {fit['focus_2'][1]:.4e}) m")
+    print(f"  max |residual| = {np.max(np.abs(fit['residuals'])):.3e} m")
+
+
+def animate(positions, sun_pos_initial, focus_b_pos, report):
+    """Play back the precomputed trajectory; nothing is integrated while animating."""
+    frame_positions = positions[::steps_per_frame][1:]
+    dist_a_frames = report["dist_a"][::steps_per_frame][1:]
+    dist_b_frames = report["dist_b"][::steps_per_frame][1:]
+
+    fig, ax = plt.subplots(figsize=(10, 10))
+
+    fig.patch.set_facecolor('black')
+    ax.set_facecolor('black')
+    ax.grid(True, color='gray', alpha=0.3)
+    ax.tick_params(colors='white')
+    ax.xaxis.label.set_color('white')
+    ax.yaxis.label.set_color('white')
+    ax.title.set_color('white')
+
+    planet_point, = ax.plot([], [], 'o', color='cyan', markersize=8, label="Comet (e=0.7)")
+    sun_point, = ax.plot([], [], 'o', color='yellow', markersize=12, label='Sun (Focus A)')
+    trail_line, = ax.plot([], [], '-', color='cyan', alpha=0.3)
+    focal_line_1, = ax.plot([], [], '-', color='red', alpha=0.5)  # line between foci
+    focal_line_2, = ax.plot([], [], '-', color='green', alpha=0.5) # line focus a to planet
+    focal_line_3, = ax.plot([], [], '-', color='blue', alpha=0.5)  # line focus b to planet
+    focal_lines_together, = ax.plot([], [], '-', color='purple', alpha=0.5)
+    focus_b_point, = ax.plot([], [], 'o', color='white', markersize=4, label='Focus B')
+
+    # Text elements for displaying distances
+    dist_text_a = ax.text(0.02, 0.95, '', transform=ax.transAxes, verticalalignment='top', fontsize=9, color='green')
+    dist_text_b = ax.text(0.02, 0.90, '', transform=ax.transAxes, verticalalignment='top', fontsize=9, color='blue')
+    dist_text_c = ax.text(0.02, 0.85, '', transform=ax.transAxes, verticalalignment='top', fontsize=9, color='purple')
+
+    # set axis limits once, centred on the ellipse
+    ra = a * (1 + e)
+    max_dist = ra * 1.1
+    center = (sun_pos_initial + focus_b_pos) / 2
+    ax.set_xlim(center[0] - max_dist * 1.1, center[0] + max_dist * 1.1)
+    ax.set_ylim(center[1] - max_dist * 1.1, center[1] + max_dist * 1.1)
+
+    def init():
+        #initialize a bunch of values that we can use for the rest of the simulation (lines, trails, text)
+        sun_point.set_data([sun_pos_initial[0]], [sun_pos_initial[1]])
+        focus_b_point.set_data([focus_b_pos[0]], [focus_b_pos[1]])
+        focal_line_1.set_data([sun_pos_initial[0], focus_b_pos[0]], [sun_pos_initial[1], focus_b_pos[1]])
+        planet_point.set_data([], [])
+        trail_line.set_data([], [])
+        focal_line_2.set_data([], [])
+        focal_line_3.set_data([], [])
+
+        dist_text_c.set_text('')
+        dist_text_a.set_text('')
+        dist_text_b.set_text('')
+        focal_lines_together.set_data([], [])
+        return planet_point, sun_point, trail_line, focal_line_1, focal_line_2, focal_line_3, focus_b_point, dist_text_a, dist_text_b, dist_text_c, focal_lines_together
+
+    def update(frame):
+        planet_pos = frame_positions[frame]
+
+        # note: we could increase trail length, but this is good since we want fast performance for verification
+        trail = frame_positions[max(0, frame - 999):frame + 1]
+        planet_point.set_data([planet_pos[0]], [planet_pos[1]])
+        trail_line.set_data(trail[:, 0], trail[:, 1])
+
+        focal_line_2.set_data([sun_pos_initial[0], planet_pos[0]], [sun_pos_initial[1], planet_pos[1]])
+        focal_line_3.set_data([focus_b_pos[0], planet_pos[0]], [focus_b_pos[1], planet_pos[1]])
+        dist_a_planet = dist_a_frames[frame]
+        dist_b_planet = dist_b_frames[frame]
+        dist_text_a.set_text(f'Focus A to Planet: {dist_a_planet:.3e} m')
+        dist_text_b.set_text(f'Focus B to Planet: {dist_b_planet:.3e} m')
+        dist_text_c.set_text(f'Sum (Foci-Planet): {dist_a_planet + dist_b_planet:.3e} m')
+
+        # only return artists that change
+        return planet_point, trail_line, focal_line_2, focal_line_3, dist_text_a, dist_text_b, dist_text_c, focal_lines_together
+
+    ax.set_aspect('equal')
+
+    focal_line_2.set_label('Line Focus A-Planet')
+    focal_line_3.set_label('Line Focus B-Planet')
+    focal_lines_together.set_label('Lines added together')
+    legend = ax.legend(loc='upper right')
+    plt.setp(legend.get_texts(), color='white')
+    anim = animation.FuncAnimation(fig, update, init_func=init, frames=len(frame_positions), interval=1, blit=True)
+    return fig, anim
+
+
+def main():
+    print("Running simulation...")
+    sun_pos_initial, positions = simulate_trajectory(frames * steps_per_frame)
+    focus_b_pos, a_initial = second_focus(sun_pos_initial, positions[0])
+
+    report = focal_report(positions, sun_pos_initial, focus_b_pos, a_initial)
+    print_report(report, a_initial)
+
+    # pass --no-animation for the batch report only
+    if "--no-animation" not in sys.argv:
+        fig, anim = animate(positions, sun_pos_initial, focus_b_pos, report)
+        plt.show()
+
+
+if __name__ == '__main__':
+    main()